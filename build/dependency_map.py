@@ -5,11 +5,20 @@
 #
 
 
+import os
 import sys
 
 # prevent generation of .pyc file
 sys.dont_write_bytecode = True
 
+# target directories are relative to the location of this script
+script_root = os.path.dirname(os.path.realpath(__file__))
+
+# Convert a target directory relative to this script to an OS specific absolute path,
+# collapsing any ../ and converting / to \ for Windows
+def resolve_target_path(target):
+    return os.path.normpath(os.path.join(script_root, target))
+
 ####### Git Dependencies #######
 
 # To allow for future updates where we may have cloned the project, store the root of
@@ -31,3 +40,14 @@ url_mapping_win = {}
 
 # Downloads required for Linux builds.
 url_mapping_linux = {}
+
+# The mappings above with their target directories resolved once, at import time.
+# git_targets holds (repo URL, target directory, commit) tuples and
+# url_targets_win/url_targets_linux hold (URL, target directory) tuples.
+git_targets = tuple((git_repo, resolve_target_path(value[0]), value[1]) for git_repo, value in git_mapping.items())
+url_targets_win = tuple((url, resolve_target_path(target)) for url, target in url_mapping_win.items())
+url_targets_linux = tuple((url, resolve_target_path(target)) for url, target in url_mapping_linux.items())
+
+# Expected sha256 of the archive downloaded for each URL dependency.
+# When a URL has an entry here, a downloaded archive that doesn't match it is rejected.
+url_sha256_mapping = {}
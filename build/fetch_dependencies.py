@@ -8,13 +8,19 @@
 # Each git repo will be updated to the commit specified in the "gitMapping" table.
 
 import os
+import hashlib
+import json
 import subprocess
+import shutil
 import sys
 import zipfile
 import tarfile
+import zlib
 import platform
 import argparse
 import stat
+import threading
+from concurrent.futures import ThreadPoolExecutor
 
 
 # Check for the python 3.x name and import it as the 2.x name
@@ -24,119 +30,586 @@ try:
 except ImportError:
     import urllib
 
+# pygit2 is optional - when it is installed git operations run in-process through libgit2
+# instead of spawning a git process for each one. Otherwise the git command line is used
+try:
+    import pygit2
+except ImportError:
+    pygit2 = None
+
+# urllib3 is optional - when it is installed downloads go through one shared connection pool, so
+# connections (and TLS sessions) are reused between downloads from the same host
+try:
+    import urllib3
+except ImportError:
+    urllib3 = None
+
+# aiohttp is optional - when it is installed URL dependencies are downloaded concurrently with asyncio,
+# sharing one connection pool. Otherwise they are downloaded with urllib on worker threads
+try:
+    import asyncio
+    import aiohttp
+except ImportError:
+    aiohttp = None
+
+# lzma is only needed to unpack .tar.xz archives, and isn't built into every Python install
+try:
+    import lzma
+except ImportError:
+    lzma = None
+
 # to allow the script to be run from anywhere - not just the cwd - store the absolute path to the script file
 script_root = os.path.dirname(os.path.realpath(__file__))
 
 # also store the basename of the file
 script_name = os.path.basename(__file__)
 
+# Lock used to serialize console output from the worker threads that update dependencies in parallel
+log_lock = threading.Lock()
+
 # Print a message to the console with appropriate pre-amble
 def log_print(message):
-    print ("\n" + script_name + ": " + message)
-    sys.stdout.flush()
+    with log_lock:
+        print ("\n" + script_name + ": " + message)
+        sys.stdout.flush()
     
 # add script root to support import of URL and git maps
 sys.path.append(script_root)
-from dependency_map import git_mapping
-from dependency_map import url_mapping_win
-from dependency_map import url_mapping_linux
-
-# Download a zip or tgz file from the specified URL and unzip into the directory defined by destination.
-# The destination directory will be created if it doesn't exist
-# if the 'update' parameter is true then the existing file and output directory will be deleted and re-created
-# TODO - this function needs to handle errors gracefully when URL is incorrect or inaccessible
-def download_url_dependencies(url_mapping, update, retry_count = 10):
-    for url in url_mapping:
-        # convert targetPath to OS specific format
-        tmp_path = os.path.join(script_root, url_mapping[url])
-        # clean up path, collapsing any ../ and converting / to \ for Windows
-        target_path = os.path.normpath(tmp_path)
-        # TODO if update is defined - delete file and directory if they exist
-        # make target directory if it doesn't exist
-        if not os.path.isdir(target_path):
-            os.makedirs(target_path)
-        # generate the target zip file name from the source URL filename and the target path
-        # note - this rule currently handles URLs that contain # and ? characters at the end
-        # those currently used by Jenkins don't have this style
-        zip_file_name = url.split('/')[-1].split('#')[0].split('?')[0]
-        zip_path = os.path.join(target_path, zip_file_name)
-        if os.path.isfile(zip_path):
-            # File exists - print message and continue
-            log_print("URL Dependency %s found and not updated" % zip_path)
+from dependency_map import git_targets, url_targets_win, url_targets_linux, url_sha256_mapping
+
+# File recording the dependencies fetched by previous runs, so work that was already done can be skipped.
+# It holds two tables:
+#   "git" - maps a git repo URL to the pinned commit it was updated to and the resulting tree SHA of HEAD
+#   "url" - maps a download URL to the path, size, modification time and sha256 of the archive that was downloaded and extracted
+fetch_cache_path = os.path.normpath(os.path.join(script_root, "../external/.fetch_cache.json"))
+fetch_cache = {"git": {}, "url": {}}
+fetch_cache_lock = threading.Lock()
+
+# Load the fetch cache from disk. A missing or unreadable cache file results in an empty cache
+def load_fetch_cache():
+    try:
+        with open(fetch_cache_path) as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        data = {}
+    with fetch_cache_lock:
+        for table in fetch_cache:
+            entries = data.get(table)
+            fetch_cache[table] = entries if isinstance(entries, dict) else {}
+
+# Write the fetch cache to disk
+def save_fetch_cache():
+    with fetch_cache_lock:
+        try:
+            os.makedirs(os.path.dirname(fetch_cache_path), exist_ok=True)
+            with open(fetch_cache_path, "w") as f:
+                json.dump(fetch_cache, f, indent=4)
+        except OSError as e:
+            log_print("Unable to write fetch cache %s: %s" % (fetch_cache_path, str(e)))
+
+# Return the fetch cache entry for key in the given table, or None if there isn't one
+def get_fetch_cache_entry(table, key):
+    with fetch_cache_lock:
+        return fetch_cache[table].get(key)
+
+# Set the fetch cache entry for key in the given table. Passing None removes the entry
+def set_fetch_cache_entry(table, key, entry):
+    with fetch_cache_lock:
+        if entry is None:
+            fetch_cache[table].pop(key, None)
         else:
-            # File doesn't exist - download and unpack it
-            log_print("Downloading " + url + " into " + zip_path)
+            fetch_cache[table][key] = entry
+
+# Compute the sha256 of a file, reading it in 1 MiB chunks
+def file_sha256(file_path):
+    sha256 = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            sha256.update(chunk)
+    return sha256.hexdigest()
+
+# Compute the sha256 of the archive downloaded for url
+# The hash recorded in the fetch cache is reused as long as the file's path, size and modification time are
+# unchanged, so an unchanged archive doesn't need to be read again
+def archive_sha256(url, zip_path):
+    zip_stat = os.stat(zip_path)
+    cached = get_fetch_cache_entry("url", url)
+    if cached is not None and cached.get("path") == zip_path and cached.get("size") == zip_stat.st_size and cached.get("mtime") == zip_stat.st_mtime_ns:
+        return cached.get("sha256")
+    return file_sha256(zip_path)
+
+# Record the archive downloaded for url, along with its sha256, in the fetch cache
+def set_archive_cache_entry(url, zip_path, zip_sha256):
+    zip_stat = os.stat(zip_path)
+    set_fetch_cache_entry("url", url, {"path": zip_path, "size": zip_stat.st_size, "mtime": zip_stat.st_mtime_ns, "sha256": zip_sha256})
+
+# Size of the buffer used to write a download to disk
+download_buffer_size = 1024 * 1024
+
+# Connection pool shared by all the downloads made through urllib3
+url_pool = None
+if urllib3 is not None:
+    url_pool = urllib3.PoolManager(maxsize=8, retries=urllib3.Retry(total=10, backoff_factor=1))
+
+# Download the contents of url into file_path
+# The data is written to a ".part" file that only replaces file_path once the whole download has been received,
+# so a download that fails or is interrupted never leaves an incomplete archive at file_path
+# Raises urllib.ContentTooShortError if less data was received than the server advertised
+def download_file(url, file_path):
+    part_path = file_path + ".part"
+    # ask for the raw archive so it isn't compressed again for transport
+    headers = {"Accept-Encoding": "identity"}
+    try:
+        if url_pool is not None and url.startswith(("http://", "https://")):
             try:
-                urllib.urlretrieve(url, zip_path)
-            except urllib.ContentTooShortError:
-                os.remove(zip_path)
-                if retry_count > 0:
-                    log_print("URL content too short. Retrying. Retries remaining: %d" % retry_count)
-                    download_url_dependencies(url_mapping, update, retry_count - 1)
-                return;
-            # Unpack the downloaded file into the target directory
-            if os.path.splitext(zip_path)[1] == ".zip":
-                # if file extension is .zip then unzip it
-                log_print("Extracting in " + target_path)
-                zipfile.ZipFile(zip_path).extractall(target_path)
-            elif os.path.splitext(zip_path)[1] == ".tgz":
-                # if file extension is .tgz then untar it
-                log_print("Extracting in " + target_path)
-                tarfile.open(zip_path).extractall(target_path)
-
-# Clone or update a git repo
-def update_git_dependencies(git_mapping, update):
-    for git_repo in git_mapping:
-        # add script directory to path
-        tmp_path = os.path.join(script_root, git_mapping[git_repo][0])
-
-        # clean up path, collapsing any ../ and converting / to \ for Windows
-        path = os.path.normpath(tmp_path)
-
-        # required commit
-        reqd_commit = git_mapping[git_repo][1]
-
-        do_checkout = False
-        if not os.path.isdir(path):
-            # directory doesn't exist - clone from git
-            log_print("Directory %s does not exist, using 'git clone' to get latest from %s" % (path, git_repo))
-            p = subprocess.Popen((["git", "clone", git_repo ,path]), stderr=subprocess.STDOUT)
-            p.wait()
-            if(p.returncode == 0):
-                do_checkout = True
-            else:
-                log_print("git clone failed with return code: %d" % p.returncode)
-                return False
-        elif update == True:
-            # directory exists and update requested - get latest from git
-            log_print("Directory %s exists, using 'git fetch --tags -f' to get latest from %s" % (path, git_repo))
-            p = subprocess.Popen((["git", "fetch", "--tags", "-f"]), cwd=path, stderr=subprocess.STDOUT)
-            p.wait()
-            if(p.returncode == 0):
-                do_checkout = True
-            else:
-                log_print("git fetch failed with return code: %d" % p.returncode)
-                return False
+                response = url_pool.request("GET", url, headers=headers, preload_content=False)
+            except urllib3.exceptions.HTTPError as e:
+                raise urllib.URLError(str(e))
+            try:
+                if response.status >= 400:
+                    raise urllib.HTTPError(url, response.status, response.reason, response.headers, None)
+                with open(part_path, "wb") as f:
+                    # a connection dropped part way through is retried like any other short download.
+                    # Any other urllib3 error, such as a read timeout, fails the download as it would with urllib
+                    try:
+                        shutil.copyfileobj(response, f, download_buffer_size)
+                    except urllib3.exceptions.ProtocolError as e:
+                        raise urllib.ContentTooShortError("retrieval incomplete: %s" % str(e), None)
+                    except urllib3.exceptions.HTTPError as e:
+                        raise urllib.URLError(str(e))
+                    expected_size = response.headers.get("Content-Length")
+                    received_size = f.tell()
+            finally:
+                # hand the connection back to the pool so the next download can reuse it
+                response.release_conn()
         else:
-            # Directory exists and update not requested
-            log_print("Git Dependency %s found and not updated" % git_repo)
-
-        if do_checkout == True:
-            log_print("Checking out required commit: %s" % reqd_commit)
-            p = subprocess.Popen((["git", "checkout", reqd_commit]), cwd=path, stderr=subprocess.STDOUT)
-            p.wait()
-            if(p.returncode != 0):
-                log_print("git checkout failed with return code: %d" % p.returncode)
-                return False
-            log_print("Ensuring any branch is on the head using git pull --ff-only origin %s" % reqd_commit)
-            p = subprocess.Popen((["git", "pull", "--ff-only", "origin", reqd_commit]), cwd=path, stderr=subprocess.STDOUT)
-            p.wait()
-            if(p.returncode != 0):
-                log_print("git merge failed with return code: %d" % p.returncode)
+            request = urllib.Request(url, headers=headers)
+            with urllib.urlopen(request) as response, open(part_path, "wb") as f:
+                shutil.copyfileobj(response, f, download_buffer_size)
+                expected_size = response.headers.get("Content-Length")
+                received_size = f.tell()
+        if expected_size is not None and received_size < int(expected_size):
+            raise urllib.ContentTooShortError("retrieval incomplete: got only %d out of %s bytes" % (received_size, expected_size), None)
+    except BaseException:
+        if os.path.isfile(part_path):
+            os.remove(part_path)
+        raise
+    os.replace(part_path, file_path)
+
+# Size of the buffer used to copy file contents out of downloaded archives.
+# The large buffer keeps the number of read/write calls low when unpacking big archives
+extract_buffer_size = 2 * 1024 * 1024
+
+# Extract all the files of a zip archive into target_path
+# Equivalent to zipfile.ZipFile.extractall but copies each file through a large buffer
+def extract_zip(zip_path, target_path):
+    target_root = os.path.abspath(target_path)
+    with zipfile.ZipFile(zip_path) as zip_file:
+        for info in zip_file.infolist():
+            member_path = os.path.abspath(os.path.join(target_root, info.filename))
+            # skip entries that would be written outside of the target directory
+            if os.path.commonpath([target_root, member_path]) != target_root:
+                log_print("Skipping zip entry outside of the target directory: " + info.filename)
+                continue
+            if info.is_dir():
+                os.makedirs(member_path, exist_ok=True)
+                continue
+            os.makedirs(os.path.dirname(member_path), exist_ok=True)
+            with zip_file.open(info) as source, open(member_path, "wb") as target:
+                shutil.copyfileobj(source, target, extract_buffer_size)
+
+# Identify a downloaded archive from the magic bytes at the start of the file
+# Returns "zip" for zip archives, the tarfile compression ("gz", "xz", "bz2", or "" for an uncompressed tar)
+# for tar archives, or None if the file isn't a recognized archive
+def archive_type(zip_path):
+    with open(zip_path, "rb") as f:
+        magic = f.read(262)
+    if magic[:2] == b"PK":
+        return "zip"
+    if magic[:2] == b"\x1f\x8b":
+        return "gz"
+    if magic[:6] == b"\xfd7zXZ\x00":
+        return "xz"
+    if magic[:3] == b"BZh":
+        return "bz2"
+    if magic[257:262] == b"ustar":
+        return ""
+    return None
+
+# Return the path the archive for url is downloaded to in target_path
+# The target directory will be created if it doesn't exist
+def archive_path(url, target_path):
+    # make target directory if it doesn't exist
+    os.makedirs(target_path, exist_ok=True)
+    # generate the target zip file name from the source URL filename and the target path
+    # note - this rule currently handles URLs that contain # and ? characters at the end
+    # those currently used by Jenkins don't have this style
+    zip_file_name = url.split('/')[-1].split('#')[0].split('?')[0]
+    return os.path.join(target_path, zip_file_name)
+
+# Check whether the archive for url has already been downloaded and extracted into zip_path
+# An existing file is only trusted if it matches the expected hash, or else the archive recorded when it was downloaded.
+# A file that doesn't match is deleted so it gets downloaded again. A file with nothing to check it against
+# (downloaded before the fetch cache existed, or placed there for an offline build) is kept but isn't trusted,
+# so it is extracted again
+def is_archive_current(url, zip_path):
+    if not os.path.isfile(zip_path):
+        return False
+    expected_sha256 = url_sha256_mapping.get(url)
+    cached = get_fetch_cache_entry("url", url)
+    known_sha256 = expected_sha256 if expected_sha256 is not None else (cached or {}).get("sha256")
+    if known_sha256 is None:
+        log_print("URL Dependency %s can't be verified, extracting it again" % zip_path)
+        return False
+    zip_sha256 = archive_sha256(url, zip_path)
+    if zip_sha256 == known_sha256:
+        log_print("URL Dependency %s found and not updated" % zip_path)
+        set_archive_cache_entry(url, zip_path, zip_sha256)
+        return True
+    log_print("URL Dependency %s does not match the expected archive, downloading it again" % zip_path)
+    os.remove(zip_path)
+    set_fetch_cache_entry("url", url, None)
+    return False
+
+# Download the archive for url into zip_path, retrying the download if it is cut short
+# Returns True on success, False otherwise
+def download_archive(url, zip_path, retry_count):
+    for attempt in range(retry_count + 1):
+        log_print("Downloading " + url + " into " + zip_path)
+        try:
+            download_file(url, zip_path)
+            return True
+        except urllib.ContentTooShortError:
+            retries_remaining = retry_count - attempt
+            if retries_remaining == 0:
+                log_print("URL content too short. No retries remaining for " + url)
                 return False
+            log_print("URL content too short. Retrying. Retries remaining: %d" % retries_remaining)
+        except (urllib.URLError, OSError) as e:
+            log_print("Download of %s failed: %s" % (url, str(e)))
+            return False
+    return False
+
+# Timeouts for the aiohttp downloads. There is no limit on the total time, as large archives can take a long
+# time to download over a slow link; only a connection that can't be made or that stops sending data times out
+aiohttp_timeout = None
+if aiohttp is not None:
+    aiohttp_timeout = aiohttp.ClientTimeout(total=None, sock_connect=60, sock_read=120)
 
+# Download the archives for all the (url, target path, zip path) tuples in downloads concurrently, using
+# aiohttp with a single session so connections are shared between the downloads
+# As soon as each download finishes, process(url, target_path, zip_path, downloaded) is submitted to executor,
+# with downloaded set to whether the download succeeded, so archives are unpacked while others are still downloading
+# Returns the futures of the submitted calls
+async def download_archives_aiohttp(downloads, executor, process):
+    # Download a single archive, then hand it over to process
+    # As in download_file, the data goes to a ".part" file that only replaces zip_path once it is complete
+    async def fetch_one(session, url, target_path, zip_path):
+        log_print("Downloading " + url + " into " + zip_path)
+        part_path = zip_path + ".part"
+        downloaded = True
+        try:
+            async with session.get(url) as response:
+                response.raise_for_status()
+                with open(part_path, "wb") as f:
+                    async for chunk in response.content.iter_chunked(download_buffer_size):
+                        f.write(chunk)
+            os.replace(part_path, zip_path)
+        except (aiohttp.ClientError, asyncio.TimeoutError, OSError) as e:
+            log_print("Download of %s failed: %s" % (url, str(e)))
+            if os.path.isfile(part_path):
+                os.remove(part_path)
+            downloaded = False
+        return executor.submit(process, url, target_path, zip_path, downloaded)
+
+    # ask for the raw archives so they aren't compressed again for transport
+    async with aiohttp.ClientSession(headers={"Accept-Encoding": "identity"}, timeout=aiohttp_timeout) as session:
+        return await asyncio.gather(*[fetch_one(session, *download) for download in downloads])
+
+# Errors raised when unpacking an archive that is truncated or corrupt
+archive_errors = (EOFError, zipfile.BadZipFile, tarfile.TarError, OSError, zlib.error)
+if lzma is not None:
+    archive_errors += (lzma.LZMAError,)
+
+# Unpack the archive downloaded for url from zip_path into target_path
+# The archive is kept on disk as it marks the dependency as already fetched on the next run
+# Returns True on success, False if the archive doesn't have the expected hash, isn't a recognized archive
+# or can't be unpacked. An archive that can't be unpacked is deleted so it is downloaded again on the next run
+def extract_archive(url, zip_path, target_path):
+    zip_sha256 = file_sha256(zip_path)
+    expected_sha256 = url_sha256_mapping.get(url)
+    if expected_sha256 is not None and zip_sha256 != expected_sha256:
+        log_print("Downloaded %s has sha256 %s but %s was expected" % (zip_path, zip_sha256, expected_sha256))
+        os.remove(zip_path)
+        return False
+    try:
+        zip_type = archive_type(zip_path)
+        if zip_type == "zip":
+            log_print("Extracting in " + target_path)
+            extract_zip(zip_path, target_path)
+        elif zip_type is not None:
+            log_print("Extracting in " + target_path)
+            # Always open the archive from disk in seekable mode ('r:<compression>'), never in streaming mode ('r|<compression>').
+            # Streaming extraction is accidentally quadratic in CPython (https://github.com/python/cpython/issues/121109)
+            # and can be orders of magnitude slower on large, well compressed archives
+            with tarfile.open(zip_path, mode="r:" + zip_type, copybufsize=extract_buffer_size) as tar_file:
+                members = tar_file.getmembers()
+                # create the directories of all the files up front, in one pass, rather than as each file is extracted
+                target_root = os.path.abspath(target_path)
+                for member_dir in {os.path.dirname(member.name) for member in members if member.isfile()}:
+                    member_dir_path = os.path.abspath(os.path.join(target_root, member_dir))
+                    if os.path.commonpath([target_root, member_dir_path]) == target_root:
+                        os.makedirs(member_dir_path, exist_ok=True)
+                # the 'data' filter rejects members that would be written outside of the target directory.
+                # It is only available in Python versions that have tarfile.data_filter
+                if hasattr(tarfile, "data_filter"):
+                    tar_file.extractall(target_path, members=members, filter="data")
+                else:
+                    tar_file.extractall(target_path, members=members)
+        else:
+            log_print("Downloaded %s is not a recognized archive and can't be extracted" % zip_path)
+            os.remove(zip_path)
+            set_fetch_cache_entry("url", url, None)
+            return False
+    except archive_errors as e:
+        log_print("Unable to extract %s: %s" % (zip_path, str(e)))
+        os.remove(zip_path)
+        set_fetch_cache_entry("url", url, None)
+        return False
+    set_archive_cache_entry(url, zip_path, zip_sha256)
     return True
 
+# Download zip or tar files from the specified URLs and unzip them into their target directories.
+# url_targets holds (URL, target directory) tuples, as defined in dependency_map.py
+# When aiohttp is available all the archives are downloaded concurrently over a shared connection pool,
+# otherwise each URL is downloaded on its own worker thread. Archives are extracted on worker threads as
+# soon as they are downloaded, so the decompression of one archive overlaps with the other downloads
+# Returns True if all the dependencies were fetched, False otherwise
+# TODO if the 'update' parameter is true then the existing file and output directory should be deleted and re-created
+def download_url_dependencies(url_targets, update, retry_count = 10):
+    # work out which archives still need to be downloaded, and which are on disk but have to be extracted again
+    downloads = []
+    unverified = []
+    for url, target_path in url_targets:
+        zip_path = archive_path(url, target_path)
+        if is_archive_current(url, zip_path):
+            continue
+        if os.path.isfile(zip_path):
+            unverified.append((url, target_path, zip_path))
+        else:
+            downloads.append((url, target_path, zip_path))
+
+    if len(downloads) == 0 and len(unverified) == 0:
+        return True
+
+    # Download the archive if it hasn't been downloaded already (retrying it if an aiohttp download failed),
+    # then unpack it
+    # Returns True on success, False otherwise
+    def download_and_extract(url, target_path, zip_path, downloaded):
+        if not downloaded and not download_archive(url, zip_path, retry_count):
+            return False
+        return extract_archive(url, zip_path, target_path)
+
+    # Unpack an archive that was already on disk. If it can't be unpacked it has been deleted,
+    # so download it again
+    # Returns True on success, False otherwise
+    def extract_or_download(url, target_path, zip_path):
+        return extract_archive(url, zip_path, target_path) or download_and_extract(url, target_path, zip_path, False)
+
+    with ThreadPoolExecutor(max_workers=len(downloads) + len(unverified)) as executor:
+        futures = [executor.submit(extract_or_download, *archive) for archive in unverified]
+        if aiohttp is not None:
+            futures += asyncio.run(download_archives_aiohttp(downloads, executor, download_and_extract))
+        else:
+            futures += [executor.submit(download_and_extract, *download, False) for download in downloads]
+        results = [future.result() for future in futures]
+
+    return all(results)
+
+# Run a git command, returning the process return code
+# The output of the command is captured and only printed, in one piece, if the command fails.
+# This stops the output of git commands running on different threads from interleaving
+def run_git(git_args, cwd=None):
+    result = subprocess.run((["git"] + git_args), cwd=cwd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
+    if(result.returncode != 0):
+        output = result.stdout.decode(errors="replace").rstrip()
+        log_print("git %s failed with return code: %d\n%s" % (" ".join(git_args), result.returncode, output))
+    return result.returncode
+
+# Create an empty repo at path with git_repo as its origin remote
+# Returns True on success, False otherwise
+def init_repo(path, git_repo):
+    if pygit2 is not None:
+        try:
+            repo = pygit2.init_repository(path)
+            repo.remotes.create("origin", git_repo)
+            return True
+        except (pygit2.GitError, ValueError) as e:
+            log_print("pygit2 failed to initialize %s, using the git command line instead: %s" % (path, str(e)))
+            shutil.rmtree(path, ignore_errors=True)
+
+    returncode = run_git(["init", "--quiet", path])
+    if(returncode == 0):
+        returncode = run_git(["remote", "add", "origin", git_repo], cwd=path)
+    if(returncode != 0):
+        return False
+
+    return True
+
+# Resolve a revision in the repo at path to its SHA, returning None if it can't be resolved
+def git_rev_parse(path, revision):
+    if pygit2 is not None:
+        try:
+            return str(pygit2.Repository(path).revparse_single(revision).id)
+        except (pygit2.GitError, KeyError, ValueError):
+            return None
+
+    try:
+        output = subprocess.check_output(["git", "rev-parse", "--verify", "--quiet", revision], cwd=path, stderr=subprocess.DEVNULL)
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return output.decode().strip()
+
+# Fetch only the required commit (without history) and check it out using pygit2
+# Returns True on success, False otherwise
+def fetch_and_checkout_pygit2(path, reqd_commit):
+    try:
+        repo = pygit2.Repository(path)
+        # remove the FETCH_HEAD left by an earlier fetch, so it can't be taken for the result of this one
+        fetch_head_path = os.path.join(repo.path, "FETCH_HEAD")
+        if os.path.isfile(fetch_head_path):
+            os.remove(fetch_head_path)
+        repo.remotes["origin"].fetch([reqd_commit], depth=1)
+        # FETCH_HEAD lines are "<sha>\t<flags>\t<description>", where the description names the fetched ref
+        with open(fetch_head_path) as f:
+            fetched_id, _, description = f.readline().rstrip("\n").partition("\t")
+        if fetched_id != reqd_commit and ("'%s'" % reqd_commit) not in description:
+            log_print("pygit2 fetched %s instead of %s, using the git command line instead" % (fetched_id, reqd_commit))
+            return False
+        commit = repo.get(fetched_id).peel(pygit2.Commit)
+        repo.checkout_tree(commit, strategy=pygit2.GIT_CHECKOUT_SAFE)
+        repo.set_head(commit.id)
+    except (pygit2.GitError, KeyError, TypeError, ValueError, OSError) as e:
+        log_print("pygit2 failed to fetch %s, using the git command line instead: %s" % (reqd_commit, str(e)))
+        return False
+
+    return True
+
+# Initialize and update the submodules of the repo at path, fetching them in parallel
+# Returns True on success, False otherwise
+def update_submodules(path):
+    # nothing to do for repos without submodules
+    if not os.path.isfile(os.path.join(path, ".gitmodules")):
+        return True
+
+    log_print("Updating submodules of %s" % path)
+    returncode = run_git(["submodule", "update", "--init", "--recursive", "--jobs", str(os.cpu_count() or 4)], cwd=path)
+    if(returncode != 0):
+        return False
+
+    return True
+
+# Fetch only the required commit (without history) and check it out, along with any submodules
+# Returns True on success, False otherwise
+def fetch_and_checkout(path, reqd_commit):
+    log_print("Fetching required commit: %s" % reqd_commit)
+    if pygit2 is not None and fetch_and_checkout_pygit2(path, reqd_commit):
+        return update_submodules(path)
+
+    returncode = run_git(["fetch", "--depth", "1", "origin", reqd_commit], cwd=path)
+    if(returncode == 0):
+        checkout_target = "FETCH_HEAD"
+    else:
+        # Some servers refuse to fetch a commit by SHA (uploadpack.allowReachableSHA1InWant is off),
+        # so fall back to fetching the full history and checking out the commit from it
+        log_print("Shallow fetch of %s failed, using 'git fetch --tags -f' to get the full history" % reqd_commit)
+        returncode = run_git(["fetch", "--tags", "-f", "origin"], cwd=path)
+        if(returncode != 0):
+            return False
+        checkout_target = reqd_commit
+
+    log_print("Checking out required commit: %s" % reqd_commit)
+    returncode = run_git(["checkout", "--detach", checkout_target], cwd=path)
+    if(returncode != 0):
+        return False
+
+    return update_submodules(path)
+
+# Remove a directory and all subdirectories
+# On Windows read-only files (such as git objects) can't be deleted, so the read-only flag is cleared
+# Returns True on success, False otherwise
+def remove_tree(dir):
+    try:
+        if sys.platform == "win32":
+            for root, dirs, files in os.walk(dir):
+                for name in dirs + files:
+                    os.chmod(os.path.join(root, name), stat.S_IWRITE)
+        shutil.rmtree(dir)
+    except OSError as e:
+        log_print("Unable to remove directory %s, delete it before fetching dependencies again: %s" % (dir, str(e)))
+        return False
+
+    return True
+
+# Clone or update a single git repo and checkout the required commit
+# Only the pinned commit is fetched, so the repo history is never downloaded
+# Returns True on success, False otherwise
+def _update_one_repo(git_repo, path, reqd_commit, update):
+    created = False
+    # only look for the repo in path itself, git commands run in a directory that isn't a repo would act on a
+    # repo containing it (i.e. this project's own repo)
+    if not os.path.isdir(os.path.join(path, ".git")):
+        if os.path.isdir(path) and len(os.listdir(path)) != 0:
+            log_print("Directory %s exists but is not a git repo, remove it to fetch %s from %s" % (path, reqd_commit, git_repo))
+            return False
+        # directory doesn't exist (or is empty) - create an empty repo to fetch the required commit into
+        log_print("Directory %s does not exist, using shallow 'git fetch' to get %s from %s" % (path, reqd_commit, git_repo))
+        created = True
+        if not init_repo(path, git_repo):
+            remove_tree(path)
+            return False
+    elif update == True:
+        # directory exists and update requested - skip it if a previous run already checked out the required commit
+        # and HEAD still has the contents that were checked out then
+        cached = get_fetch_cache_entry("git", git_repo)
+        if cached is not None and cached.get("commit") == reqd_commit:
+            head_tree = git_rev_parse(path, "HEAD^{tree}")
+            if head_tree is not None and head_tree == cached.get("tree"):
+                log_print("Git Dependency %s already matches required commit %s, not updated" % (git_repo, reqd_commit))
+                return True
+        # get the required commit from git
+        log_print("Directory %s exists, using shallow 'git fetch' to get %s from %s" % (path, reqd_commit, git_repo))
+    elif git_rev_parse(path, "HEAD") is None:
+        # directory exists but nothing was ever checked out into it (e.g. an earlier fetch was interrupted)
+        log_print("Directory %s has no commit checked out, using shallow 'git fetch' to get %s from %s" % (path, reqd_commit, git_repo))
+    else:
+        # Directory exists and update not requested
+        log_print("Git Dependency %s found and not updated" % git_repo)
+        return True
+
+    set_fetch_cache_entry("git", git_repo, None)
+    if not fetch_and_checkout(path, reqd_commit):
+        # like a failed git clone, don't leave behind an empty repo that a later run would take as fetched
+        if created:
+            remove_tree(path)
+        return False
+    set_fetch_cache_entry("git", git_repo, {"commit": reqd_commit, "tree": git_rev_parse(path, "HEAD^{tree}")})
+
+    return True
+
+# Clone or update all git repos
+# The repos are independent of each other and the work is network bound, so they are updated in parallel
+# git_targets holds (repo URL, target directory, commit) tuples, as defined in dependency_map.py
+def update_git_dependencies(git_targets, update):
+    tasks = list(git_targets)
+    if len(tasks) == 0:
+        return True
+
+    with ThreadPoolExecutor(max_workers=len(tasks)) as executor:
+        results = list(executor.map(lambda task: _update_one_repo(*task, update), tasks))
+
+    return all(results)
+
 # Main body of update functionality
 def do_fetch_dependencies(update, internal):
     # Print git version being used
@@ -144,15 +617,21 @@ def do_fetch_dependencies(update, internal):
     git_output = subprocess.check_output(git_cmd, stderr=subprocess.STDOUT)
     log_print("%s" % git_output)
 
+    # Load the record of the dependencies fetched by previous runs
+    load_fetch_cache()
+
     # Update all git dependencies
-    if update_git_dependencies(git_mapping, update):
-        if sys.platform == "win32":
-            download_url_dependencies(url_mapping_win, update)
-        elif sys.platform.startswith('linux') == True:
-            download_url_dependencies(url_mapping_linux, update)
-        return True
-    else:
-        return False
+    try:
+        if update_git_dependencies(git_targets, update):
+            if sys.platform == "win32":
+                return download_url_dependencies(url_targets_win, update)
+            elif sys.platform.startswith('linux') == True:
+                return download_url_dependencies(url_targets_linux, update)
+            return True
+        else:
+            return False
+    finally:
+        save_fetch_cache()
 
 if __name__ == '__main__':
     # fetch_dependencies.py executed as a script
@@ -9,13 +9,13 @@
 #
 import os
 import sys
-import importlib.util
 import argparse
 import shutil
+import stat
 import subprocess
-import distutils.spawn
-import platform
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor
 
 # prevent fetch_dependency script from leaving a compiled .pyc file in the script directory
 sys.dont_write_bytecode = True
@@ -26,6 +26,9 @@ SCRIPT_ROOT = os.path.dirname(os.path.realpath(__file__))
 # also store the basename of the file
 SCRIPT_NAME = os.path.basename(__file__)
 
+# Directory containing the top level CMakeLists.txt
+CMAKELIST_PATH = os.path.join(SCRIPT_ROOT, os.path.normpath(".."))
+
 # Global variables
 # Configuration suffix
 config_suffix = ""
@@ -57,8 +60,11 @@ def parse_arguments():
     else:
         parser.add_argument("--qt-root", default="~/Qt", help="specify the root directory for locating QT on this system (default: ~/Qt) ")
         parser.add_argument("--disable-extra-qt-lib-deploy", action="store_true", help="prevent extra Qt library files (XCB and ICU libs) from being copied during post build step")
+    if sys.platform != "win32":
+        parser.add_argument("--generator", default=None, help="specify the CMake generator to use (default: the generator of an existing build directory, otherwise Ninja if it is installed, otherwise Unix Makefiles)")
     parser.add_argument("--qt", default="5.15.2", help="specify the version of QT to be used with the script (default: 5.15.2)" )
     parser.add_argument("--clean", action="store_true", help="delete any directories created by this script")
+    parser.add_argument("--clean-deps", action="store_true", help="same as --clean. The project doesn't download any sources through CMake (FetchContent or CPM.cmake), so there is no download cache to delete")
     parser.add_argument("--no-qt", default=True, action="store_true", help="build a headless version (not applicable for all products)")
     parser.add_argument("--build-number", default="0",
                         help="specify the build number, primarily to be used by build machines to produce versioned builds")
@@ -70,9 +76,10 @@ def parse_arguments():
     parser.add_argument("--update", action="store_true", help="Force fetch_dependencies script to update all dependencies")
     parser.add_argument("--output", default=output_root, help="specify the output location for generated cmake and build output files (default = OS specific subdirectory of location of PreBuild.py script)")
     parser.add_argument("--build", action="store_true", help="build all supported configurations on completion of prebuild step")
-    parser.add_argument("--build-jobs", default="4", help="number of simultaneous jobs to run during a build (default = 4)")
+    parser.add_argument("--build-jobs", default=None, help="number of simultaneous jobs to run during a build (default = CMAKE_BUILD_PARALLEL_LEVEL if set, otherwise the number of cores)")
     parser.add_argument("--analyze", action="store_true", help="perform static analysis of code on build (currently VS2017 only)")
     parser.add_argument("--vscode", action="store_true", help="generate CMake options into VsCode settings file for this project")
+    parser.add_argument("--no-ccache", action="store_true", help="don't use sccache or ccache to compile, even if one is installed (not applicable for Visual Studio builds)")
     if support_32_bit_build:
         parser.add_argument("--platform", default="x64", choices=["x64", "x86"], help="specify the platform (32 or 64 bit)")
     args = parser.parse_args()
@@ -93,16 +100,44 @@ def log_error_and_exit(message):
     sys.stdout.flush()
     sys.exit(-1)
 
+# Remove a directory and all subdirectories
+# On Windows read-only files (such as git objects) can't be deleted, so the read-only flag is cleared
+# on everything in a single pass first rather than handling a failure for each file during the delete
+def remove_tree(dir):
+    if sys.platform == "win32":
+        for root, dirs, files in os.walk(dir):
+            for name in dirs + files:
+                os.chmod(os.path.join(root, name), stat.S_IWRITE)
+    shutil.rmtree(dir)
+
+# Remove a single entry of a directory being deleted
+def remove_entry(entry):
+    if entry.is_dir(follow_symlinks=False):
+        remove_tree(entry.path)
+    else:
+        if sys.platform == "win32":
+            os.chmod(entry.path, stat.S_IWRITE)
+        os.remove(entry.path)
+
 # Remove a directory and all subdirectories - printing relevant status
 def rmdir_print(dir):
     log_print ("Removing directory - " + dir)
-    if os.path.exists(dir):
-        try:
-            shutil.rmtree(dir)
-        except Exception as e:
-            log_error_and_exit ("Failed to delete directory - " + dir + ": " + str(e))
-    else:
+    try:
+        # on Windows let rd do the whole tree in one process, it's much faster than deleting file by file
+        if sys.platform == "win32" and os.path.isdir(dir):
+            subprocess.run(["cmd", "/c", "rd", "/s", "/q", dir], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+            if not os.path.exists(dir):
+                return
+        # delete the top level entries in parallel, then the (now empty) directory itself
+        with os.scandir(dir) as it:
+            entries = list(it)
+        with ThreadPoolExecutor(max_workers=os.cpu_count()) as executor:
+            list(executor.map(remove_entry, entries))
+        os.rmdir(dir)
+    except FileNotFoundError:
         log_print ("    " + dir + " doesn't exist!")
+    except Exception as e:
+        log_error_and_exit ("Failed to delete directory - " + dir + ": " + str(e))
 
 # Make a directory if it doesn't exist - print information
 def mkdir_print(dir):
@@ -110,6 +145,27 @@ def mkdir_print(dir):
         log_print ("Creating Directory: " + dir)
         os.makedirs(dir)
 
+# Cache of the subdirectories of each directory read so far, so that checking several candidate directories
+# under the same parent only reads the parent once instead of calling stat for each candidate
+_dir_cache = {}
+
+# Return the set of subdirectory names of a directory (normalized for case on Windows), or an empty set if it can't be read.
+# The type of each entry comes from the directory listing itself, so no stat is needed except for symlinks
+def subdirs_cached(dir):
+    dir = os.path.normcase(os.path.normpath(dir))
+    if dir not in _dir_cache:
+        try:
+            with os.scandir(dir) as entries:
+                _dir_cache[dir] = {os.path.normcase(entry.name) for entry in entries if entry.is_dir()}
+        except OSError:
+            _dir_cache[dir] = set()
+    return _dir_cache[dir]
+
+# Check whether a directory exists, using the cached listing of its parent directory
+def dir_exists_cached(path):
+    parent, name = os.path.split(os.path.normpath(path))
+    return os.path.normcase(name) in subdirs_cached(parent)
+
 # Generate the full path to QT, converting path to OS specific form
 # Look for Qt path in specified Qt root directory
 # Example:
@@ -125,69 +181,73 @@ def mkdir_print(dir):
 # again. This allows the default Qt install path on Linux to be
 # found without needing to specify a qt-root
 #
+# Once the Qt dir is found, the platform specific qt_leaf dir (i.e. gcc_64) must exist under it.
+#
 # Returns a tuple, containing a boolean and a string.
-# If the boolean is True, then the string is the found path to Qt.
+# If the boolean is True, then the string is the found path to the Qt leaf dir.
 # If the boolean is False, then the string is an error message indicating which paths were searched
-def check_qt_path(qt_root, qt_root_arg, qt_arg):
+def check_qt_path(qt_root, qt_root_arg, qt_arg, qt_leaf):
     qt_path_not_found_error = "Unable to find Qt root dir. Use --qt-root to specify\n    Locations checked:"
     qt_path = os.path.normpath(qt_root + "/" + "Qt" + qt_arg + "/" + qt_arg)
-    if not os.path.exists(qt_path):
+    if not dir_exists_cached(qt_path):
         qt_path_not_found_error = qt_path_not_found_error + "\n      " + qt_path
         qt_path = os.path.normpath(qt_root + "/" + qt_arg)
-        if not os.path.exists(qt_path):
+        if not dir_exists_cached(qt_path):
             qt_path_not_found_error = qt_path_not_found_error + "\n      " + qt_path
             # if there is no user-specified qt-root, then check additional locations
             # used by the various Qt installers
             if qt_root_arg == parser.get_default('qt_root'):
                 qt_path = os.path.normpath(qt_root + "/../" + "Qt" + qt_arg + "/" + qt_arg)
-                if not os.path.exists(qt_path):
+                if not dir_exists_cached(qt_path):
                     qt_path_not_found_error = qt_path_not_found_error + "\n      " + qt_path
                     qt_path = os.path.normpath(qt_root + "/../" + qt_arg)
-                    if not os.path.exists(qt_path):
+                    if not dir_exists_cached(qt_path):
                         qt_path_not_found_error = qt_path_not_found_error + "\n      " + qt_path
                         return False, qt_path_not_found_error
             else:
                 return False, qt_path_not_found_error
+    qt_path = os.path.normpath(qt_path + "/" + qt_leaf)
+    if not dir_exists_cached(qt_path):
+        return False, "QT Path does not exist - " + qt_path
     return True, qt_path
 
 
-# Common code related to generating a build configuration
-def generate_config(config, args):
+# Lock used to print the output of cmake processes running in parallel one whole process at a time
+cmake_output_lock = threading.Lock()
+
+# Run cmake with the given arguments, writing its output straight to this script's stdout.
+# If output_title is given, the output is captured instead and printed in one block under that title once
+# cmake has finished, so the output of cmake processes running in parallel doesn't interleave
+# Returns the cmake return code
+def run_cmake(cmake_args, cwd, output_title=None):
+    # make sure everything printed so far appears before the cmake output
+    sys.stdout.flush()
+    if output_title is None:
+        return subprocess.run(cmake_args, cwd=cwd, stderr=subprocess.STDOUT).returncode
+
+    result = subprocess.run(cmake_args, cwd=cwd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
+    with cmake_output_lock:
+        log_print(output_title + "\n" + result.stdout.decode(errors="replace").rstrip())
+        sys.stdout.flush()
+    return result.returncode
+
+# Generate the CMake arguments shared by all build configurations.
+# This only needs to be done once, even though CMake is run for each configuration on linux platforms
+def build_common_args(args, qt_path):
     global config_suffix
     global support_32_bit_build
-    if (config != ""):
-        cmake_dir = os.path.join(args.output, config + config_suffix)
-        mkdir_print(cmake_dir)
-    else:
-        cmake_dir = args.output
-
-    cmakelist_path = os.path.join(SCRIPT_ROOT, os.path.normpath(".."))
 
     release_output_dir = os.path.join(args.output, "release" + config_suffix)
     debug_output_dir = os.path.join(args.output, "debug" + config_suffix)
 
-    # Specify the type of Build files to generate
-    cmake_generator = None
-    if sys.platform == "win32":
-        if args.vs == "2022":
-            cmake_generator="Visual Studio 17 2022"
-        elif args.vs == "2019":
-            cmake_generator="Visual Studio 16 2019"
-        else:
-            cmake_generator="Visual Studio 15 2017"
-            if not support_32_bit_build:
-                cmake_generator = cmake_generator + " Win64"
-    elif sys.platform == "darwin":
-        if args.xcode:
-            cmake_generator="Xcode"
-        else:
-            cmake_generator="Unix Makefiles"
-    else:
-        cmake_generator="Unix Makefiles"
+    cmake_generator = args.generator
     if args.no_qt:
-        cmake_args = ["cmake", cmakelist_path, "-DHEADLESS=TRUE"]
+        cmake_args = ["cmake", CMAKELIST_PATH, "-DHEADLESS=TRUE"]
+        # on Windows, headless builds use the Visual Studio generator CMake picks by default
+        if sys.platform != "win32":
+            cmake_args.extend(["-G", cmake_generator])
     else:
-        cmake_args = ["cmake", cmakelist_path, "-DCMAKE_PREFIX_PATH=" + qt_path, "-G", cmake_generator]
+        cmake_args = ["cmake", CMAKELIST_PATH, "-DCMAKE_PREFIX_PATH=" + qt_path, "-G", cmake_generator]
 
     if sys.platform == "win32":
         if args.vs != "2022":
@@ -204,6 +264,11 @@ def generate_config(config, args):
         cmake_args.extend(["-DINTERNAL_BUILD:BOOL=TRUE"])
     # END_REMOVE_DURING_SANITIZATION
 
+    # Compile through a compiler cache if one was found
+    if args.compiler_launcher is not None:
+        cmake_args.extend(["-DCMAKE_C_COMPILER_LAUNCHER=" + args.compiler_launcher])
+        cmake_args.extend(["-DCMAKE_CXX_COMPILER_LAUNCHER=" + args.compiler_launcher])
+
     # Use build number.
     cmake_args.extend(["-DRGD_BUILD_NUMBER=" + str(args.build_number)])
     cmake_args.extend(["-DRGD_BUILD_SUFFIX=" + str(args.build_suffix)])
@@ -217,6 +282,15 @@ def generate_config(config, args):
     cmake_args.extend(["-DCMAKE_RUNTIME_OUTPUT_DIRECTORY_DEBUG=" + debug_output_dir])
     cmake_args.extend(["-DCMAKE_LIBRARY_OUTPUT_DIRECTORY_DEBUG=" + debug_output_dir])
 
+    if sys.platform == "darwin":
+        cmake_args.extend(["-DNO_APP_BUNDLE=" + str(args.no_bundle)])
+
+    return cmake_args
+
+# Generate the full list of CMake arguments for a build configuration from the common arguments
+def build_config_args(common_args, config):
+    cmake_args = list(common_args)
+
     if sys.platform != "win32":
         if "RELEASE" in config.upper():
             cmake_args.extend(["-DCMAKE_BUILD_TYPE=Release"])
@@ -225,18 +299,64 @@ def generate_config(config, args):
         else:
             log_error_and_exit("unknown configuration: " + config)
 
-    if sys.platform == "darwin":
-        cmake_args.extend(["-DNO_APP_BUNDLE=" + str(args.no_bundle)])
+    return cmake_args
+
+# Return the generator recorded in the CMakeCache.txt of an existing build directory, or None if there is none
+def cached_cmake_generator(cmake_dir):
+    try:
+        with open(os.path.join(cmake_dir, "CMakeCache.txt")) as f:
+            for line in f:
+                if line.startswith("CMAKE_GENERATOR:INTERNAL="):
+                    return line.rstrip("\n").split("=", 1)[1]
+    except OSError:
+        pass
+    return None
+
+# Specify the type of Build files to generate.
+# On linux & mac, CMake can't switch the generator of an existing build directory, so one that is already
+# generated keeps its generator unless --generator is given. Otherwise Ninja is preferred if it's installed
+def select_cmake_generator(args, cmake_dir):
+    global support_32_bit_build
+    if sys.platform == "win32":
+        if args.vs == "2022":
+            return "Visual Studio 17 2022"
+        elif args.vs == "2019":
+            return "Visual Studio 16 2019"
+        elif support_32_bit_build:
+            return "Visual Studio 15 2017"
+        else:
+            return "Visual Studio 15 2017 Win64"
+    if sys.platform == "darwin" and args.xcode:
+        return "Xcode"
+    if args.generator is not None:
+        return args.generator
+    cmake_generator = cached_cmake_generator(cmake_dir)
+    if cmake_generator is None:
+        cmake_generator = "Ninja" if shutil.which("ninja") else "Unix Makefiles"
+    return cmake_generator
+
+# Common code related to generating a build configuration
+# If parallel is True, other configurations are being generated at the same time, so the cmake output is
+# captured and printed in one block per configuration
+def generate_config(config, args, common_args, parallel=False):
+    global config_suffix
+    if (config != ""):
+        cmake_dir = os.path.join(args.output, config + config_suffix)
+        mkdir_print(cmake_dir)
+    else:
+        cmake_dir = args.output
 
+    cmake_args = build_config_args(common_args, config)
 
     if args.vscode:
         # Generate data into VSCode Settings file
 
-        # only generate this file once - even though parent function is called twice on linux platforms
+        # only generate this file once - even though parent function is called twice on linux platforms.
+        # This also means only one of the configurations generated in parallel writes the file
         if (config == "") or (config == "debug"):
             import json
 
-            vscode_json_path = cmakelist_path + "/.vscode"
+            vscode_json_path = CMAKELIST_PATH + "/.vscode"
             vscode_json_file = vscode_json_path + "/settings.json"
 
             log_print ("Updating VSCode settings file: " + vscode_json_file)
@@ -274,14 +394,17 @@ def generate_config(config, args):
             with open(vscode_json_file, 'w') as f:
                 json.dump(json_data, f, indent=4)
 
-    if not distutils.spawn.find_executable(cmake_args[0]):
+    if shutil.which(cmake_args[0]) is None:
         log_error_and_exit("cmake not found")
 
-    p = subprocess.Popen(cmake_args, cwd=cmake_dir, stderr=subprocess.STDOUT)
-    p.wait()
-    sys.stdout.flush()
-    if(p.returncode != 0):
-        log_error_and_exit("cmake failed with %d" % p.returncode)
+    output_title = None
+    if parallel:
+        output_title = "CMake output for " + config + " configuration:"
+    returncode = run_cmake(cmake_args, cmake_dir, output_title)
+    if(returncode != 0):
+        if (config != ""):
+            log_error_and_exit("cmake failed for the %s configuration with %d" % (config, returncode))
+        log_error_and_exit("cmake failed with %d" % returncode)
 
 
 def main():
@@ -299,13 +422,6 @@ def main():
     # Enable/Disable options supported by this project
     support_32_bit_build = False
 
-    # only import fetch_dependencies.py if the script exists
-    can_fetch = True
-    if importlib.util.find_spec("fetch_dependencies") is not None:
-        import fetch_dependencies
-    else:
-        can_fetch = False
-
     # Define the build configurations that will be generated
     configs = ["debug", "release"]
 
@@ -341,8 +457,18 @@ def main():
 
     script_args.output = cmake_output_dir
 
+    script_args.generator = select_cmake_generator(script_args, os.path.join(cmake_output_dir, configs[0] + config_suffix))
+
+    # Locate a compiler cache (sccache or ccache), so rebuilds of unchanged sources are served from the cache.
+    # Compiler launchers are only supported by the Makefile and Ninja generators
+    script_args.compiler_launcher = None
+    if not script_args.no_ccache and sys.platform != "win32":
+        script_args.compiler_launcher = shutil.which("sccache") or shutil.which("ccache")
+        if script_args.compiler_launcher is not None:
+            log_print("Using compiler cache: " + script_args.compiler_launcher)
+
     # Clean all files generated by this script or the build process
-    if (script_args.clean):
+    if (script_args.clean or script_args.clean_deps):
         log_print ("Cleaning build ...\n")
         # delete the CMake output directory
         rmdir_print(cmake_output_dir)
@@ -356,8 +482,15 @@ def main():
             rmdir_print(dir)
         sys.exit(0)
 
-    # Call fetch_dependencies script
-    if can_fetch:
+    # Call fetch_dependencies script, if it exists. It's only imported here so that --help and --clean don't
+    # pay for loading it and its download libraries
+    try:
+        import fetch_dependencies
+    except ModuleNotFoundError as e:
+        if e.name != "fetch_dependencies":
+            raise
+        fetch_dependencies = None
+    if fetch_dependencies is not None:
         log_print ("Fetching project dependencies ...\n")
         if (fetch_dependencies.do_fetch_dependencies(script_args.update, script_args.internal) == False):
             log_error_and_exit("Unable to retrieve dependencies")
@@ -365,6 +498,7 @@ def main():
     # Create the CMake output directory
     mkdir_print(cmake_output_dir)
 
+    qt_path = None
     if not script_args.no_qt:
         # locate the relevant QT libraries
         # generate the platform specific portion of the QT path name
@@ -376,7 +510,7 @@ def main():
             qt_leaf = "gcc_64"
 
         qt_expanded_root = os.path.expanduser(script_args.qt_root)
-        qt_found,qt_path = check_qt_path(qt_expanded_root, script_args.qt_root, script_args.qt)
+        qt_found,qt_path = check_qt_path(qt_expanded_root, script_args.qt_root, script_args.qt, qt_leaf)
 
         # START_REMOVE_DURING_SANITIZATION
         if qt_found == False:
@@ -384,28 +518,37 @@ def main():
             log_print ("Fetching Qt...\n")
             target_qt_dir = qt_expanded_root
             fetch_qt.do_fetch_qt(target_qt_dir)
-            qt_found,qt_path = check_qt_path(qt_expanded_root, script_args.qt_root, script_args.qt)
+            # the directory listings read before fetching Qt are stale now
+            _dir_cache.clear()
+            qt_found,qt_path = check_qt_path(qt_expanded_root, script_args.qt_root, script_args.qt, qt_leaf)
         # END_REMOVE_DURING_SANITIZATION
 
         if qt_found == False:
             log_error_and_exit(qt_path)
 
-        qt_path = os.path.normpath(qt_path + "/"  + qt_leaf)
-
-        if not os.path.exists(qt_path) and not script_args.no_qt:
-            log_error_and_exit ("QT Path does not exist - " + qt_path)
-
     log_print("Generating build files ...")
+    common_args = build_common_args(script_args, qt_path)
     if sys.platform == "win32":
         # On Windows always generates both Debug and Release configurations in a single solution file
-        generate_config("", script_args)
+        generate_config("", script_args, common_args)
     else:
-        # For Linux & Mac - generate both Release and Debug configurations
-        for config in configs:
-            generate_config(config, script_args)
+        # For Linux & Mac - generate both Release and Debug configurations.
+        # Each configuration is generated into its own directory, so CMake is run for them in parallel
+        with ThreadPoolExecutor(max_workers=len(configs)) as executor:
+            # consume the results so that a failure in either configuration is reported
+            list(executor.map(lambda config: generate_config(config, script_args, common_args, True), configs))
 
     # Optionally, the user can choose to build all configurations on conclusion of the prebuild job
     if (script_args.build):
+        # Number of jobs: from the command line, then the CMAKE_BUILD_PARALLEL_LEVEL environment variable, then
+        # the number of cores. MSBuild uses all the cores by itself when no number is given
+        build_jobs = script_args.build_jobs or os.environ.get("CMAKE_BUILD_PARALLEL_LEVEL")
+        if build_jobs:
+            msbuild_jobs = "/m:" + build_jobs
+        else:
+            msbuild_jobs = "/m"
+            build_jobs = str(os.cpu_count() or 4)
+
         for config in configs:
             log_print( "\nBuilding " + config + " configuration\n")
             build_dir = ""
@@ -415,14 +558,14 @@ def main():
                 build_dir = cmake_output_dir
 
                 # For Visual Studio, specify the config to build
-                cmake_args = ["cmake", "--build", build_dir, "--config", config, "--target", "ALL_BUILD", "--",  "/m:" + script_args.build_jobs]
+                cmake_args = ["cmake", "--build", build_dir, "--config", config, "--target", "ALL_BUILD", "--",  msbuild_jobs]
                 if script_args.analyze:
     #                cmake_args.append("/p:CodeAnalysisTreatWarningsAsErrors=true")
     #                cmake_args.append("/p:CodeAnalysisRuleSet=NativeRecommendedRules.ruleset")
                     cmake_args.append("/p:CodeAnalysisRuleSet=NativeMinimumRules.ruleset")
                     cmake_args.append("/p:RunCodeAnalysis=true")
 
-                cmake_args_docs = ["cmake", "--build", build_dir, "--config", config, "--target", "Documentation", "--", "/m:" + script_args.build_jobs]
+                cmake_args_docs = ["cmake", "--build", build_dir, "--config", config, "--target", "Documentation", "--", msbuild_jobs]
             else:
                 # linux & mac use the same commands
                 # generate the path to the config specific makefile
@@ -434,22 +577,17 @@ def main():
                     print("config_suffix = %s"%config_suffix)
                     build_dir = os.path.join(cmake_output_dir, config + config_suffix)
 
-                cmake_args = ["cmake", "--build", build_dir, "--parallel", script_args.build_jobs]
-
-                cmake_args_docs = ["cmake", "--build", build_dir, "--config", config, "--target", "Documentation", "--parallel", script_args.build_jobs]
+                cmake_args = ["cmake", "--build", build_dir, "--parallel", build_jobs]
 
-            p = subprocess.Popen(cmake_args, cwd=cmake_output_dir, stderr=subprocess.STDOUT)
-            p.wait()
-            sys.stdout.flush()
+                cmake_args_docs = ["cmake", "--build", build_dir, "--config", config, "--target", "Documentation", "--parallel", build_jobs]
 
-            if(p.returncode != 0):
-                log_error_and_exit("CMake build failed with %d" % p.returncode)
+            returncode = run_cmake(cmake_args, cmake_output_dir)
+            if(returncode != 0):
+                log_error_and_exit("CMake build failed with %d" % returncode)
 
             log_print( "\nBuilding Documentation\n")
 
-            p = subprocess.Popen(cmake_args_docs, cwd=cmake_output_dir, stderr=subprocess.STDOUT)
-            p.wait()
-            sys.stdout.flush()
+            run_cmake(cmake_args_docs, cmake_output_dir)
 
     minutes, seconds = divmod(time.time() - start_time, 60)
     log_print("Successfully completed in {0:.0f} minutes, {1:.1f} seconds".format(minutes,seconds))
@@ -10,6 +10,8 @@
 #      --versionfile Use <file_path> as the full path name of for rgd_version_info.h
 #
 import os
+import re
+import sys
 import argparse
 
 # Get full path to script to support run from anywhere.
@@ -25,26 +27,19 @@ VERSIONARGS = PARSER.parse_args()
 
 # Initialize file for search.
 RGDVERSIONFILE = os.path.normpath(os.path.join(SCRIPTROOT, '../..', 'source/radeon_gpu_detective_cli/rgd_version_info.h'))
-RGDVERSIONDATA = None
 if not VERSIONARGS.versionfile == None:
     RGDVERSIONFILE = os.path.normpath(VERSIONARGS.versionfile)
-if os.path.exists(RGDVERSIONFILE):
-    RGDVERSIONDATA = open(RGDVERSIONFILE)
-else:
+if not os.path.exists(RGDVERSIONFILE):
     print("ERROR: Unable to open file: %s"%RGDVERSIONFILE)
     sys.exit(1)
 
-# Get major, minor, and update version strings.
-MAJOR = None
-MINOR = None
-UPDATE = None
-for line in RGDVERSIONDATA:
-    if 'define RGD_VERSION_MAJOR  ' in line:
-        MAJOR = (line.split()[2])
-    if 'define RGD_VERSION_MINOR ' in line:
-        MINOR = (line.split()[2])
-    if 'define RGD_VERSION_UPDATE ' in line:
-        UPDATE = (line.split()[2])
+# Read the whole file at once and get major, minor, and update version strings in a single regex pass.
+VERSIONPATTERN = re.compile(rb'#\s*define\s+RGD_VERSION_(MAJOR|MINOR|UPDATE)\s+(\S+)')
+with open(RGDVERSIONFILE, 'rb') as RGDVERSIONDATA:
+    VERSIONS = {name.decode(): value.decode() for name, value in VERSIONPATTERN.findall(RGDVERSIONDATA.read())}
+MAJOR = VERSIONS.get('MAJOR')
+MINOR = VERSIONS.get('MINOR')
+UPDATE = VERSIONS.get('UPDATE')
 
 if VERSIONARGS.major == True:
     print(MAJOR)